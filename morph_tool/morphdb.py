@@ -17,9 +17,12 @@ print(total.features({'neurite': {'section_lengths': ['max']}}))
 
 import collections
 import logging
+import operator
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from typing import Any, Dict, Iterable, List, Optional, Tuple, Union
 
+import numpy as np
 import pandas as pd
 import xmltodict
 from more_itertools import always_iterable
@@ -46,6 +49,22 @@ BOOLEAN_REPAIR_ATTRS = [
 COLUMNS = ['name', 'mtype', 'msubtype', 'mtype_no_subtype',
            'layer', 'label', 'path'] + BOOLEAN_REPAIR_ATTRS + ['axon_inputs']
 
+# Values allowed for the boolean repair flags, an empty tag being parsed as None.
+# Unless clearly stated as false, missing tags default to True
+# - According to Eilif, an empty use_axon (corresponding to a null in the database)
+#   means that the axon is supposed to be used
+# - dendrite_repair       defaults to True in BlueRepairSDK
+# - basal_dendrite_repair defaults to True in BlueRepairSDK
+# - unravel: well I guess we always want to do it
+VALID_REPAIR_VALUES = frozenset(('true', 'false', 'True', 'False', None))
+TRUE_REPAIR_VALUES = frozenset(('true', 'True', None))
+
+# Location of the <morphology></morphology> tags in the XML
+MORPHOLOGY_XML_PATH = ['neurondb', 'listing', 'morphology']
+
+# Columns read from each <morphology></morphology> tag
+XML_FIELDS = ['name', 'mtype', 'layer'] + BOOLEAN_REPAIR_ATTRS + ['axon_inputs']
+
 
 class MorphInfo:
     """A class the contains information about a morphology.
@@ -53,8 +72,14 @@ class MorphInfo:
     Its role is to abstract away the raw data.
     """
 
+    # No per instance __dict__: smaller objects and faster attribute access
+    __slots__ = tuple(COLUMNS)
+
     MTYPE_SEPARATOR = ':'
 
+    # Fetches all the COLUMNS attributes in a single C call
+    _ROW_GETTER = operator.attrgetter(*COLUMNS)
+
     def __init__(self, name: str, mtype: str, layer: Optional[Union[str, int]] = None,
                  **kwargs):
         """A MorphInfo constructor.
@@ -79,6 +104,9 @@ class MorphInfo:
                 - axon_inputs
                 - path
                 - label
+
+        Raises:
+            ValueError: if a repair attribute is None or a string
         """
         self.name = name
         self.mtype = mtype
@@ -89,63 +117,61 @@ class MorphInfo:
         self.layer = str(layer or '')
 
         for attr in BOOLEAN_REPAIR_ATTRS:
-            setattr(self, attr, kwargs.get(attr, True))
+            value = kwargs.get(attr, True)
+            # The bool cast of the dataframe would turn None into False and 'false' into True
+            if value is None or isinstance(value, str):
+                raise ValueError(f'{attr} must be a boolean, got: {value!r}')
+            setattr(self, attr, value)
 
         self.axon_inputs = kwargs.get('axon_inputs', [])
         self.path = kwargs.get('path')
         self.label = kwargs.get('label')
 
     @classmethod
-    def _from_xmldict(cls, item: Dict[str, Any]):
-        """A MorphInfo constructor.
+    def _parse_xmldict(cls, item: Dict[str, Any]) -> Dict[str, Any]:
+        """Validate and convert the content of a <morphology> XML tag.
 
         Args:
             item: A dictionary that represents the content of the XML file.
                   The only mandatory keys are [name, mtype, layer]
+
+        Returns:
+            A dictionary with the keys of XML_FIELDS
         """
-        morph = cls(
-            item['name'],
-            cls.MTYPE_SEPARATOR.join(filter(None, [item['mtype'], item.get('msubtype')])),
-            item['layer']
-        )
-
-        def is_true(repair: Dict[str, Any], key: str) -> bool:
-            """Parse a string representing a boolean repair flag and returns its boolean value.
-
-            Unless clearly stated as false, missing tags default to True
-            - According to Eilif, an empty use_axon (corresponding to a null in the database)
-              means that the axon is supposed to be used
-            - dendrite_repair       defaults to True in BlueRepairSDK
-            - basal_dendrite_repair defaults to True in BlueRepairSDK
-            - unravel: well I guess we always want to do it
-            """
-            el = repair.get(key)
-            if el not in {'true', 'false', 'True', 'False', None}:
-                raise ValueError(f'Invalid XML element {key} has invalid value: {el}\n'
+        # Empty <mtype/> and <msubtype/> tags are parsed as None
+        mtype, msubtype = item['mtype'] or '', item.get('msubtype') or ''
+        fields = {
+            'name': item['name'],
+            'mtype': (f'{mtype}{cls.MTYPE_SEPARATOR}{msubtype}' if mtype and msubtype
+                      else mtype or msubtype),
+            'layer': str(item['layer'] or ''),
+        }
+
+        repair = item.get('repair') or {}
+        for attr in BOOLEAN_REPAIR_ATTRS:
+            value = repair.get(attr)
+            if value not in VALID_REPAIR_VALUES:
+                raise ValueError(f'Invalid XML element {attr} has invalid value: {value}\n'
                                  'Allowed values:\n'
                                  '- empty tag (which is equivalent to True)\n'
                                  '- true\n'
                                  '- True\n'
                                  '- false\n'
                                  '- False')
-            return el in (None, 'true', 'True', )
-
-        repair = item.get('repair', {})
-        for attr in BOOLEAN_REPAIR_ATTRS:
-            setattr(morph, attr, is_true(repair, attr))
+            fields[attr] = value in TRUE_REPAIR_VALUES
 
         # "always_iterable" deals with <axoninput> not being interpreted
         # as a list if there is a single entry <axoninput> entry in the XML.
-        morph.axon_inputs = list(always_iterable(
+        fields['axon_inputs'] = list(always_iterable(
             (repair.get('axon_sources') or {}).get('axoninput', [])
         ))
 
-        return morph
+        return fields
 
     @property
     def row(self) -> List:
         """Flattened data structude ready to be used by a dataframe."""
-        return [getattr(self, attr) for attr in COLUMNS]
+        return list(self._ROW_GETTER(self))
 
     def __repr__(self):
         """Overloaded method."""
@@ -158,6 +184,31 @@ class MorphDB:
 
     It takes care of maintaining uniqueness of the MorphInfo element
     and methods to write neurondb to various format (xml, dat, csv)
+
+    The dataframe `df` has the following columns:
+       'name': the morpho name (without extension)
+       'mtype': the mtype with its subtype
+       'msubtype': the msubtype (the part of the mtype after the ":")
+       'mtype_no_subtype': the mtype without the msubtype
+       'layer': the layer (as a string)
+       # repair related columns
+       'use_axon': states that the morphology's axon can be used as a donor for axon grafting
+       'use_dendrites': states that this morphology can be used as a recipient for axon grafting
+       'axon_repair': flag to activate axon repair
+       'dendrite_repair': flag to activate dendrites repair
+       'basal_dendrite_repair': flag to activate basal dendrites repair (dendrite_repair
+                                must be true as well)
+       'tuft_dendrite_repair': flag to activate tuft dendrites repair (dendrite_repair
+                                must be true as well)
+       'oblique_dendrite_repair': flag to activate oblique dendrites repair (dendrite_repair
+                                must be true as well)
+       'unravel': flag to activate unravelling
+       'axon_inputs': the list of morphologies whose axon can be grafted on this morphology
+       # deprecated
+       'use_for_stats': Legacy flag that was used to determine if an axon was suitable to be
+                        used as a axoninput
+       'label': the group label of the morphology
+       'path': the morphology file path (None if the file was not found)
     """
 
     def __init__(self, morph_info_seq: Optional[Iterable[MorphInfo]] = None):
@@ -178,47 +229,86 @@ class MorphDB:
         """
         obj = cls()
         columns = ['name', 'layer', 'mtype']
-        obj.df = pd.read_csv(neurondb, sep=r'\s+', names=columns, usecols=range(len(columns)))
-
-        fulltypes = obj.df.mtype.str.split(':', n=1, expand=True).fillna('')
-        if len(fulltypes.columns) > 1:
-            obj.df['mtype_no_subtype'] = fulltypes[0]
-            obj.df['msubtype'] = fulltypes[1]
-        else:
-            obj.df['mtype_no_subtype'] = obj.df['mtype']
-            obj.df['msubtype'] = ''
-
-        obj.df['label'] = label
-        for missing_col in set(COLUMNS) - set(obj.df.columns):
-            obj.df[missing_col] = None
-            obj.df.layer = obj.df.layer.astype('str')
-            obj.df['path'] = obj.df['name'].map(morph_paths)
-            obj.df = obj.df.reindex(columns=COLUMNS)
-        for key in BOOLEAN_REPAIR_ATTRS:
-            obj.df[key] = True
-            obj.df['axon_inputs'] = [[] for _ in range(len(obj.df))]
+        # pandas special-cases sep=r'\s+' so that it runs on the C tokenizer
+        obj.df = pd.read_csv(neurondb, sep=r'\s+', engine='c', names=columns,
+                             usecols=range(len(columns)), dtype=str)
+
+        # The separator and msubtype columns are empty strings if there is no msubtype,
+        # all columns are NaN (filled with empty strings) if there is no mtype
+        fulltypes = obj.df.mtype.str.partition(MorphInfo.MTYPE_SEPARATOR).fillna('')
+
+        obj.df = obj.df.assign(
+            mtype_no_subtype=fulltypes[0],
+            msubtype=fulltypes[2],
+            label=label,
+            path=obj.df['name'].map(morph_paths),
+            axon_inputs=[[] for _ in range(len(obj.df))],
+            **{key: True for key in BOOLEAN_REPAIR_ATTRS},
+        ).reindex(columns=COLUMNS)
         return obj
 
     @classmethod
     def _from_neurondb_xml(cls, neurondb, morph_paths, label):
         obj = MorphDB()
-        with neurondb.open() as fd:
-            content = fd.read()
-            neurondb = xmltodict.parse(content)
+        data = {column: [] for column in XML_FIELDS}
+        listing_path = MORPHOLOGY_XML_PATH[:-1]
+        listing_seen = False
 
-        morphologies = neurondb['neurondb']['listing']['morphology']
+        def add_morphology(path, item):
+            """Streaming callback called by xmltodict for each <morphology> tag.
 
-        # Case where there is a single <morphology></morphology> tag in the XML
-        if not isinstance(morphologies, list):
-            morphologies = [morphologies]
-        morphologies = filter(None, morphologies)
-        morphologies = list(map(MorphInfo._from_xmldict, morphologies))  # noqa, pylint: disable=protected-access
-
-        for morph in morphologies:
-            morph.label = label
-            morph.path = morph_paths.get(morph.name)
+            Streaming avoids materializing the dict of the whole XML file, the items
+            are appended to the dataframe columns as soon as they are parsed.
+            """
+            nonlocal listing_seen
+            tags = [tag for tag, _ in path]
+            if tags[:-1] == listing_path:
+                listing_seen = True
+                # Empty <morphology></morphology> tags are streamed as None or as whitespaces
+                if tags[-1] == MORPHOLOGY_XML_PATH[-1] and isinstance(item, dict):
+                    fields = MorphInfo._parse_xmldict(item)  # noqa, pylint: disable=protected-access
+                    for column in XML_FIELDS:
+                        data[column].append(fields[column])
+            return True
+
+        def find_listing(path, _):
+            """Streaming callback looking for the <listing> tag itself."""
+            nonlocal listing_seen
+            listing_seen = listing_seen or [tag for tag, _ in path] == listing_path
+            return True
 
-        obj.df = MorphDB._create_dataframe(morphologies)
+        with neurondb.open() as fd:
+            content = fd.read()
+            xmltodict.parse(content,
+                            item_depth=len(MORPHOLOGY_XML_PATH),
+                            item_callback=add_morphology)
+            # An empty <listing></listing> has no child to be streamed
+            if not listing_seen:
+                xmltodict.parse(content,
+                                item_depth=len(listing_path),
+                                item_callback=find_listing)
+
+        if not listing_seen:
+            raise ValueError(f'Invalid neurondb {neurondb}: there is no '
+                             f'<{"><".join(listing_path)}> element')
+
+        # No MorphInfo objects in between: the parsed columns go straight to the dataframe.
+        # Same vectorized split as for .dat files, msubtype is empty if there is none
+        # (reindex: the partition of an empty series has no columns)
+        fulltypes = pd.Series(data['mtype'], dtype=object).str.partition(
+            MorphInfo.MTYPE_SEPARATOR).reindex(columns=range(3))
+        data['mtype_no_subtype'] = fulltypes[0].tolist()
+        data['msubtype'] = fulltypes[2].tolist()
+        for key in BOOLEAN_REPAIR_ATTRS:
+            data[key] = np.fromiter(data[key], dtype=bool, count=len(data['name']))
+        data['label'] = [label] * len(data['name'])
+        # Not Series.map: missing morphologies must have a None path, not NaN
+        data['path'] = [morph_paths.get(name) for name in data['name']]
+
+        # Object columns are explicit, so that the schema does not depend on the row count
+        obj.df = pd.DataFrame({column: data[column] if column in BOOLEAN_REPAIR_ATTRS
+                               else pd.Series(data[column], dtype=object)
+                               for column in COLUMNS})
         MorphDB._sanitize_df_types(obj.df)
         return obj
 
@@ -289,25 +379,33 @@ class MorphDB:
         return MorphDB(MorphInfo(name, mtype, label=label, path=paths[name])
                        for name, mtype in mtypes)
 
-    def _to_xmldict(self):
-        """Transform the data to a xmldict compatible dictionary."""
-        def get_repair_attr(morph, attr):
-            if attr == 'axon_inputs':
-                return 'axon_sources', {'axoninput': getattr(morph, attr)}
-            else:
-                return attr, getattr(morph, attr)
+    def _iter_xmldict(self):
+        """Transform the data to a xmldict compatible dictionary.
+
+        The morphology entries are generated lazily so that xmltodict.unparse can stream
+        them to the output, hence the returned dictionary can only be serialized once.
+        """
+        # Plain python values (.tolist()) so that xmltodict writes booleans as 'true'/'false'
+        columns = [self.df[column].tolist() for column in
+                   ['name', 'mtype_no_subtype', 'msubtype', 'layer', 'axon_inputs']
+                   + BOOLEAN_REPAIR_ATTRS]
+
+        # xmltodict writes an empty generator as an indented <listing>, unlike an empty list
+        if self.df.empty:
+            return {'neurondb': {'listing': {'morphology': []}}}
 
         return {'neurondb': {'listing': {
-            'morphology': [{
-                'name': morph.name,
-                'mtype': morph.mtype_no_subtype,
-                'msubtype': morph.msubtype,
-                'layer': morph.layer,
-                'repair': dict(
-                    get_repair_attr(morph, attr)
-                    for attr in BOOLEAN_REPAIR_ATTRS + ['axon_inputs']
-                )
-            } for morph in self.df.itertuples()]}
+            'morphology': ({
+                'name': name,
+                'mtype': mtype_no_subtype,
+                'msubtype': msubtype,
+                'layer': layer,
+                'repair': {
+                    **dict(zip(BOOLEAN_REPAIR_ATTRS, repair_flags)),
+                    'axon_sources': {'axoninput': axon_inputs},
+                }
+            } for name, mtype_no_subtype, msubtype, layer, axon_inputs, *repair_flags
+                in zip(*columns))}
         }}
 
     def write(self, output_path: Union[Path, str]):
@@ -322,8 +420,8 @@ class MorphDB:
             self.df[['name', 'layer', 'mtype']].to_csv(output_path, sep=' ', header=False,
                                                        index=False)
         elif ext == '.xml':
-            with output_path.open('w', encoding='utf-8') as fd:
-                fd.write(xmltodict.unparse(self._to_xmldict(), pretty=True))
+            with output_path.open('wb') as fd:
+                xmltodict.unparse(self._iter_xmldict(), output=fd, encoding='utf-8', pretty=True)
         else:
             raise ValueError(f'Unsupported neurondb extensions ({ext}).'
                              ' Should be one of: (xml,csv,dat)')
@@ -347,7 +445,7 @@ class MorphDB:
             raise ValueError(
                 f'DataFrame has morphologies with undefined filepaths: {missing_morphs}')
 
-        df = self.df.copy().reset_index(drop=True)
+        df = self.df.reset_index(drop=True)
         df.columns = pd.MultiIndex.from_product((["properties"], df.columns.values))
         stats = extract_dataframe(df.loc[:, ('properties', 'path')], config, n_workers)
         return df.join(stats.drop(columns='name', level=1), how='inner')
@@ -355,18 +453,25 @@ class MorphDB:
     def check_files_exist(self):
         """Raises if `self.df.path` has None values or non existing paths."""
         missing_morphs = self.df[self.df.path.isnull()].name.values
-        if missing_morphs:
+        if missing_morphs.size:
             raise ValueError(
                 f'DataFrame has morphologies with undefined filepaths: {missing_morphs}')
 
-        for path in self.df['path']:
-            if not path.exists():
-                raise ValueError(f'Non existing path: {path}')
+        # Each check is a blocking stat() call, issuing them concurrently pays off
+        # on network filesystems
+        paths = self.df['path'].tolist()
+        with ThreadPoolExecutor() as executor:
+            exists = list(executor.map(lambda path: path.exists(), paths))
+        missing_paths = [path for path, path_exists in zip(paths, exists) if not path_exists]
+        if missing_paths:
+            raise ValueError(f'Non existing paths: {missing_paths}')
 
     def __add__(self, other):
         """Overloaded method."""
         obj = MorphDB()
-        obj += self
+        # No need to concatenate with the empty obj.df first: __iadd__ does not
+        # modify the frame in place, obj.df is re-bound to a new one
+        obj.df = self.df
         obj += other
         return obj
 
@@ -383,37 +488,6 @@ class MorphDB:
 
         return self
 
-    @staticmethod
-    def _create_dataframe(morphologies: List[MorphInfo]):
-        """Creates a dataframe.
-
-        The dataframe has the following columns:
-           'name': the morpho name (without extension)
-           'mtype': the mtype with its subtype
-           'msubtype': the msubtype (the part of the mtype after the ":")
-           'mtype_no_subtype': the mtype without the msubtype
-           'layer': the layer (as a string)
-           # repair related columns
-           'use_axon': states that the morphology's axon can be used as a donor for axon grafting
-           'use_dendrites': states that this morphology can be used as a recipient for axon grafting
-           'axon_repair': flag to activate axon repair
-           'dendrite_repair': flag to activate dendrites repair
-           'basal_dendrite_repair': flag to activate basal dendrites repair (dendrite_repair
-                                    must be true as well)
-           'tuft_dendrite_repair': flag to activate tuft dendrites repair (dendrite_repair
-                                    must be true as well)
-           'oblique_dendrite_repair': flag to activate oblique dendrites repair (dendrite_repair
-                                    must be true as well)
-           'unravel': flag to activate unravelling
-           'axon_inputs': the list of morphologies whose axon can be grafted on this morphology
-           # deprecated
-           'use_for_stats': Legacy flag that was used to determine if an axon was suitable to be
-                            used as a axoninput
-        """
-        df = pd.DataFrame([morph.row for morph in morphologies], columns=COLUMNS)
-        MorphDB._sanitize_df_types(df)
-        return df
-
     @staticmethod
     def _sanitize_df_types(df):
         """Set up the proper types for each columns.
@@ -421,5 +495,9 @@ class MorphDB:
         Args:
             df: the dataframe to be sanitized
         """
-        df.astype({key: bool for key in BOOLEAN_REPAIR_ATTRS}, copy=False)
+        # astype is not inplace: the cast columns must be assigned back to the dataframe.
+        # Columns that are already boolean (the most common case) are left untouched.
+        to_cast = [key for key in BOOLEAN_REPAIR_ATTRS if df[key].dtype != bool]
+        if to_cast:
+            df[to_cast] = df[to_cast].astype(bool)
         df["axon_inputs"] = df["axon_inputs"].apply(tuple)
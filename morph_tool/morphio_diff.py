@@ -9,6 +9,8 @@ class DiffResult:
     Additional information about why they differ is stored in DiffResult.info.
     """
 
+    __slots__ = ('_is_different', 'info')
+
     def __init__(self, is_different, info=None):
         """The DiffResult constructor.
 
@@ -28,6 +30,35 @@ class DiffResult:
         return self.__bool__()
 
 
+def _are_identical(morph1, morph2, attr_list, rtol, atol):
+    """Compare the data of all the sections at once.
+
+    If the section structure is the same and the concatenated data of all sections are close,
+    the section by section comparison of `diff` cannot find any difference. A False return
+    value only means that the morphologies may differ.
+
+    Args:
+        morph1 (morphio.Morphology): a morphology
+        morph2 (morphio.Morphology): a morphology
+        attr_list (List[str]): the section attributes to compare
+        rtol (float): the relative tolerance used for comparing points (see numpy.isclose help)
+        atol (float): the absolute tolerance used for comparing points (see numpy.isclose help)
+    """
+    if not (np.array_equal(morph1.section_offsets, morph2.section_offsets)
+            and np.array_equal(morph1.section_types, morph2.section_types)
+            and morph1.connectivity == morph2.connectivity):
+        return False
+
+    for attrib in attr_list:
+        val1, val2 = getattr(morph1, attrib), getattr(morph2, attrib)
+        if val1.shape != val2.shape:
+            return False
+        # A plain equality check is much cheaper than the tolerance computation
+        if not (np.array_equal(val1, val2) or np.allclose(val1, val2, rtol=rtol, atol=atol)):
+            return False
+    return True
+
+
 def diff(morph1, morph2, rtol=1.e-5, atol=1.e-8, *, skip_perimeters=False, all_diffs=False):
     """Returns a DiffResult object that is equivalent to True when morphologies differ.
 
@@ -67,6 +98,11 @@ def diff(morph1, morph2, rtol=1.e-5, atol=1.e-8, *, skip_perimeters=False, all_d
     if not skip_perimeters:
         attr_list.append('perimeters')
 
+    # Fast path for the common case of identical morphologies, the section by section
+    # comparison below is only needed to report where morphologies differ
+    if _are_identical(morph1, morph2, attr_list, rtol, atol):
+        return DiffResult(False)
+
     for section1, section2 in zip(morph1.iter(), morph2.iter()):
         for attrib in attr_list:
             val1, val2 = getattr(section1, attrib), getattr(section2, attrib)
@@ -81,6 +117,8 @@ def diff(morph1, morph2, rtol=1.e-5, atol=1.e-8, *, skip_perimeters=False, all_d
                     diffs.append(current_diff)
                 else:
                     return DiffResult(True, current_diff)
+            if np.array_equal(val1, val2):
+                continue
             is_close = np.isclose(val1, val2, rtol=rtol, atol=atol)
             if not is_close.all():
                 first_diff_index = np.where(~is_close)[0][0]
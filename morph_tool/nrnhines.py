@@ -7,7 +7,6 @@ from typing import List, Sequence, Union
 import numpy as np
 from neurom import COLS, NeuriteType, iter_sections, load_morphology
 from neurom.core.types import NeuriteIter
-from numpy.testing import assert_almost_equal
 
 try:
     import neuron
@@ -34,59 +33,74 @@ def get_NRN_cell(filename: Path):
     return cell
 
 
-def _has_single_child(section):
-    """Does the section have only one child ?"""
-    return len(section.children()) == 1
-
-
 def _zero_length_section(section, epsilon=1e-8):
     """Is zero length section ?"""
     return section.length < epsilon
 
 
-def _validate_section(nrn_neuron, nrm_neuron, nrm_idx, nrn_idx):
+def _validate_section_mapping(NeuroM_cell, NRN_sections, mapping):
     """Raise if the mapping NeuroM_section_to_NRN_section is not correct."""
-    NRN_sections = list(nrn_neuron.icell.all)
-
-    nrm_s = nrm_neuron.sections[nrm_idx]
-
-    if nrn_idx is None:
-        # The only reason for the mapping not to exist is a zero length section
-        # because NRN discards them
-        assert _zero_length_section(nrm_s)
-        return
-
-    nrn_s = NRN_sections[nrn_idx]
+    # Morphology.sections builds a new list at each access, it is only built once here
+    NeuroM_sections = NeuroM_cell.sections
 
-    nrn_pts = [nrn_s.x3d(0), nrn_s.y3d(0), nrn_s.z3d(0)]
-    nrm_pts = nrm_s.points[0, COLS.XYZ]
-
-    err_msg = (f'ERROR Section mismatch: NRN ID ({nrn_idx}) != NeuroM ID ({nrm_idx})'
-               'NRN section:\n'
-               f'{nrn_pts}\n\n'
-               'NeuroM section:\n'
-               f'{nrm_pts}')
-    assert_almost_equal(nrn_pts,
-                        nrm_pts,
-                        decimal=2,
-                        err_msg=err_msg)
-
-
-def _validate_section_mapping(NeuroM_cell, NRN_cell, mapping):
-    """Raise if the mapping NeuroM_section_to_NRN_section is not correct."""
     for nrm_idx, nrn_idx in mapping.items():
-        _validate_section(NRN_cell, NeuroM_cell, nrm_idx, nrn_idx)
+        if nrn_idx is None:
+            # The only reason for the mapping not to exist is a zero length section
+            # because NRN discards them
+            assert _zero_length_section(NeuroM_sections[nrm_idx])
+
+    # The first points of all the mapped sections are gathered to be compared at once
+    mapped = [(nrm_idx, nrn_idx) for nrm_idx, nrn_idx in mapping.items() if nrn_idx is not None]
+    NRN_starts = np.array([_section_start(NRN_sections[nrn_idx]) for _, nrn_idx in mapped],
+                          dtype=float).reshape(-1, 3)
+    NeuroM_starts = np.array([NeuroM_sections[nrm_idx].points[0, COLS.XYZ]
+                              for nrm_idx, _ in mapped], dtype=float).reshape(-1, 3)
+
+    # Same criterion as numpy.testing.assert_almost_equal(decimal=2), without its overhead
+    mismatches = np.flatnonzero(~np.all(np.abs(NRN_starts - NeuroM_starts) < 1.5e-2, axis=1))
+    if mismatches.size:
+        nrm_idx, nrn_idx = mapped[mismatches[0]]
+        raise AssertionError(
+            f'ERROR Section mismatch: NRN ID ({nrn_idx}) != NeuroM ID ({nrm_idx})'
+            'NRN section:\n'
+            f'{NRN_starts[mismatches[0]].tolist()}\n\n'
+            'NeuroM section:\n'
+            f'{NeuroM_sections[nrm_idx].points[0, COLS.XYZ]}')
+
+
+def NeuroM_section_to_NRN_section(filename: Path, *, NeuroM_cell=None, NRN_cell=None):
+    """Returns a mapping from NeuroM section IDs to NRN ones.
+
+    Args:
+        filename: the morphology path
+        NeuroM_cell (neurom.core.Morphology): the morphology already loaded with NeuroM,
+            to avoid loading it again
+        NRN_cell (bluepyopt.ephys.models.CellModel): the cell already returned by
+            get_NRN_cell, to avoid instantiating it again
+    """
+    if NeuroM_cell is None:
+        NeuroM_cell = load_morphology(filename)
+    if NRN_cell is None:
+        NRN_cell = get_NRN_cell(filename)
+    return _map_sections(NeuroM_cell, NRN_cell)
 
 
-def NeuroM_section_to_NRN_section(filename: Path):
-    """Returns a mapping from NeuroM section IDs to NRN ones."""
-    NeuroM_cell = load_morphology(filename)
-    NRN_cell = get_NRN_cell(filename)
+def _map_sections(NeuroM_cell, NRN_cell):
+    """Returns a mapping from NeuroM section IDs to NRN ones for already loaded cells.
 
+    Args:
+        NeuroM_cell (neurom.core.Morphology): the NeuroM morphology
+        NRN_cell (bluepyopt.ephys.models.CellModel): the NRN cell of the same morphology
+    """
     mapping = {}
 
     NRN_sections = list(NRN_cell.icell.all)
 
+    # HOC calls are expensive: the tree of NRN sections is read once, as lists of children ids
+    NRN_ids = {NRN_section.name(): i for i, NRN_section in enumerate(NRN_sections)}
+    NRN_children = [[NRN_ids[child.name()] for child in NRN_section.children()]
+                    for NRN_section in NRN_sections]
+
     def is_soma(NRN_section):
         """Is the NRN section a soma section."""
         return NRN_section.name().endswith('.soma[0]')
@@ -104,26 +118,26 @@ def NeuroM_section_to_NRN_section(filename: Path):
                 continue
 
             L.debug('Zero length section with children')
-            NRN_section = NRN_sections[counter]
+            NRN_id = counter
             counter -= 1
 
         else:
             mapping[NeuroM_section.id] = counter
-            NRN_section = NRN_sections[counter]
+            NRN_id = counter
 
         L.debug('NeuroM section (%s) has been mapped to NRN section (%s)',
                 NeuroM_section.id, mapping[NeuroM_section.id])
 
         # Skip single child NeuroM_section because they have already been
         # merged in the NeuroM morphology
-        while _has_single_child(NRN_section):
+        while len(NRN_children[NRN_id]) == 1:
             L.debug('Skipping single child')
             counter += 1
-            NRN_section = NRN_section.children()[0]
+            NRN_id = NRN_children[NRN_id][0]
 
         counter += 1
 
-    _validate_section_mapping(NeuroM_cell, NRN_cell, mapping)
+    _validate_section_mapping(NeuroM_cell, NRN_sections, mapping)
     return mapping
 
 
@@ -136,24 +150,31 @@ def _interpolate_compartments(points, boundaries_segment_ids, boundaries_positio
                                        compartment boundary belongs
         boundaries_positions (List): the 3D positions of the compartment boundaries
     """
+    segment_ids = np.asarray(boundaries_segment_ids)
+    positions = np.asarray(boundaries_positions)
+
+    # The last point of each compartment before its end boundary is added: its last
+    # intermediate point if it has some, its start boundary otherwise
+    has_intermediate_points = segment_ids[1:] > segment_ids[:-1]
+    last_points = np.where(has_intermediate_points[:, np.newaxis],
+                           points[segment_ids[1:]], positions[:-1])
+
+    # If the end boundary matches a point from the 'points' list, it has already been added
+    # to the compartment, no need to re-add it. Checked for all compartments at once.
+    ends_already_added = np.isclose(last_points, positions[1:]).all(axis=1)
+
     compartment_points = []
     for i, (segment_id_start, position) in enumerate(
             zip(boundaries_segment_ids[:-1], boundaries_positions[:-1])):
-        compartment = [position]
-        segment_id_end = boundaries_segment_ids[i + 1]
-
-        # The compartment might span on multiple segments, we add the intermediate points here
-        intermediate_point_id = segment_id_start + 1
-        while intermediate_point_id <= segment_id_end:
-            compartment.append(points[intermediate_point_id])
-            intermediate_point_id += 1
+        # The compartment might span on multiple segments, these are the intermediate points
+        intermediate_points = points[segment_id_start + 1:boundaries_segment_ids[i + 1] + 1]
 
-        # If the boundary point matches a point from the 'points' list, it has already been added
-        # to the 'compartment' list, no need to re-add it
-        if not np.allclose(compartment[-1], boundaries_positions[i + 1]):
-            compartment.append(boundaries_positions[i + 1])
+        if ends_already_added[i]:
+            compartment = ([position], intermediate_points)
+        else:
+            compartment = ([position], intermediate_points, [boundaries_positions[i + 1]])
 
-        compartment_points.append(np.vstack(compartment))
+        compartment_points.append(np.concatenate(compartment))
     return compartment_points
 
 
@@ -165,34 +186,41 @@ def _compartment_paths(points, n_compartments):
         n_compartments (int): the number of compartments
     """
     segments_directions = np.diff(points, axis=0)
-    segment_lengths = np.linalg.norm(segments_directions, axis=1)
-    cumulative_pathlength = np.append(0, np.cumsum(segment_lengths))
-    pathlengths_at_compartment_boundaries = [
-        i * cumulative_pathlength[-1] / float(n_compartments) for i in range(n_compartments)]
-
-    boundaries_segment_ids = (np.searchsorted(
-        cumulative_pathlength, pathlengths_at_compartment_boundaries, side='right') - 1).tolist()
-    boundaries_positions = []
-    for segment_id, boundary_pathlength in zip(boundaries_segment_ids,
-                                               pathlengths_at_compartment_boundaries):
-
-        # The pathlength between the start of segment #segment_id and the boundary
-        remaining_pathlength = boundary_pathlength - cumulative_pathlength[segment_id]
-
-        # the boundary is somewhere in between point #segment_id and #segment_id+1
-        # Here we compute its position in term of relative pathlength
-        segment_fraction = remaining_pathlength / segment_lengths[segment_id]
-        position = points[segment_id] + segment_fraction * segments_directions[segment_id]
-        boundaries_positions.append(position)
+    # Row-wise dot products, without the squared (N, 3) temporary of np.linalg.norm
+    segment_lengths = np.sqrt(
+        np.einsum('ij,ij->i', segments_directions, segments_directions))
+    # Filled instead of a copy by np.append, accumulating with the dtype of the lengths.
+    # Not cumsum(out=...): it would cast the uninitialized buffer and may warn on overflow
+    cumulative_pathlength = np.empty(len(points))
+    cumulative_pathlength[0] = 0
+    cumulative_pathlength[1:] = np.cumsum(segment_lengths)
+    pathlengths_at_compartment_boundaries = (
+        np.arange(n_compartments) * cumulative_pathlength[-1] / n_compartments)
+
+    # The ids of the segments in which each boundary is located
+    segment_ids = np.searchsorted(
+        cumulative_pathlength, pathlengths_at_compartment_boundaries, side='right') - 1
+
+    # The boundary is somewhere in between point #segment_id and #segment_id+1
+    # Here we compute its position in term of relative pathlength
+    remaining_pathlengths = (pathlengths_at_compartment_boundaries
+                             - cumulative_pathlength[segment_ids])
+    # Positions keep the floating dtype of the points (ie. float32 for NeuroM sections),
+    # explicitly so that it does not depend on the NumPy promotion rules (NEP 50)
+    segment_fractions = (remaining_pathlengths / segment_lengths[segment_ids]).astype(
+        np.result_type(points.dtype, np.float16), copy=False)
+    boundaries_positions = list(
+        points[segment_ids] + segment_fractions[:, np.newaxis] * segments_directions[segment_ids])
 
     # Adding the last boundary which corresponds to the last point of the section
-    boundaries_segment_ids.append(len(points) - 1)
+    boundaries_segment_ids = segment_ids.tolist() + [len(points) - 1]
     boundaries_positions.append(points[-1])
 
     return _interpolate_compartments(points, boundaries_segment_ids, boundaries_positions)
 
 
-def NeuroM_section_to_NRN_compartment_paths(morph_path: Path):
+def NeuroM_section_to_NRN_compartment_paths(morph_path: Path, *, NeuroM_cell=None,
+                                            NRN_cell=None):
     """Returns a dictionary NeuroM section id -> path of each compartment for the section.
 
     Path are formed by following the section points until the pathlength of the compartment is
@@ -200,6 +228,10 @@ def NeuroM_section_to_NRN_compartment_paths(morph_path: Path):
 
     Args:
         morph_path: the morphology path
+        NeuroM_cell (neurom.core.Morphology): the morphology already loaded with NeuroM,
+            to avoid loading it again
+        NRN_cell (bluepyopt.ephys.models.CellModel): the cell already returned by
+            get_NRN_cell, to avoid instantiating it again
 
     1) Compute the cumulative pathlength along the section segments_directions
     2) Get the compartment pathlengths (compartment are of equal pathlength in a given section)
@@ -228,11 +260,14 @@ def NeuroM_section_to_NRN_compartment_paths(morph_path: Path):
                 [1.        , 2.        , 0.        ],
                 [2.        , 2.        , 0.        ]])]
     """
-    NeuroM_cell = load_morphology(morph_path)
-    NRN_neuron = get_NRN_cell(morph_path)
-    NRN_sections = list(NRN_neuron.icell.all)
+    if NeuroM_cell is None:
+        NeuroM_cell = load_morphology(morph_path)
+    if NRN_cell is None:
+        NRN_cell = get_NRN_cell(morph_path)
+    NRN_sections = list(NRN_cell.icell.all)
 
-    mapping = NeuroM_section_to_NRN_section(morph_path)
+    # The cells are reused: loading them again is the most expensive step
+    mapping = _map_sections(NeuroM_cell, NRN_cell)
 
     NeuroM_to_compartment_position_mapping = {}
 
@@ -242,8 +277,9 @@ def NeuroM_section_to_NRN_compartment_paths(morph_path: Path):
 
         NRN_section = NRN_sections[mapping[section.id]]
 
+        # A contiguous copy of the XYZ columns, slicing them is a strided view of the points
         NeuroM_to_compartment_position_mapping[section.id] = _compartment_paths(
-            section.points[:, COLS.XYZ], NRN_section.nseg)
+            np.ascontiguousarray(section.points[:, COLS.XYZ]), NRN_section.nseg)
 
     return NeuroM_to_compartment_position_mapping
 
@@ -263,17 +299,53 @@ def point_to_section_end(sections: Sequence[neuron.nrn.Section],  # pylint: disa
         atol: absolute tolerance
         rtol: relative tolerance
     """
-    point = np.asarray(point)
+    return _first_close_section_end(_section_ends(sections), point, atol, rtol)
+
+
+def points_to_section_ends(sections: Sequence[neuron.nrn.Section],  # pylint: disable=no-member
+                           points: Sequence[List[float]],
+                           atol: float = 1e-08,
+                           rtol: float = 1e-05) -> List[Union[None, int]]:
+    """Returns the result of ``point_to_section_end`` for each point of ``points``.
+
+    The section ends are only read once from NRN, which is much faster than calling
+    ``point_to_section_end`` for each point.
+
+    Args:
+        sections: a sequence of sections
+        points: a sequence of 3D coordinates
+        atol: absolute tolerance
+        rtol: relative tolerance
+    """
+    section_ends = _section_ends(sections)
+    return [_first_close_section_end(section_ends, point, atol, rtol) for point in points]
+
+
+def _section_start(section):
+    """Returns the 3D coordinates of the first point of a NRN section."""
+    return section.x3d(0), section.y3d(0), section.z3d(0)
+
+
+def _section_end(section):
+    """Returns the 3D coordinates of the last point of a NRN section."""
+    last_index = section.n3d() - 1
+    return section.x3d(last_index), section.y3d(last_index), section.z3d(last_index)
+
+
+def _section_ends(sections):
+    """Returns a (n_sections, 3) array with the last point of each section.
+
+    The section ends are gathered in a single array so that they are compared at once.
+    """
+    return np.array([_section_end(section) for section in sections], dtype=float).reshape(-1, 3)
 
-    for index, section in enumerate(sections):
-        last_index = section.n3d() - 1
-        last_section_point = [section.x3d(last_index),
-                              section.y3d(last_index),
-                              section.z3d(last_index)]
 
-        if np.isclose(point, last_section_point, atol=atol, rtol=rtol).all():
-            return index
-    return None
+def _first_close_section_end(section_ends, point, atol, rtol):
+    """Returns the index of the first row of ``section_ends`` close to ``point``, or None."""
+    is_close = np.isclose(np.asarray(point), section_ends, atol=atol, rtol=rtol).all(axis=1)
+    if not is_close.any():
+        return None
+    return int(np.argmax(is_close))
 
 
 class NestedPool(multiprocessing.pool.Pool):  # pylint: disable=abstract-method
@@ -1,4 +1,5 @@
 """Utils."""
+import os
 from functools import partial
 from pathlib import Path
 from typing import Optional
@@ -17,10 +18,25 @@ def iter_morphology_files(folder, recursive=False, extensions=None):
     """Iterator that returns path to morphology files."""
     extensions = extensions or {'asc', 'h5', 'swc'}
     if recursive:
-        files = Path(folder).rglob('*')
-    else:
-        files = Path(folder).glob('*')
-    return filter(partial(is_morphology, extensions=extensions), files)
+        return filter(partial(is_morphology, extensions=extensions), Path(folder).rglob('*'))
+    return _scan_morphology_files(folder, extensions)
+
+
+def _scan_morphology_files(folder, extensions):
+    """Iterator that returns path to morphology files directly inside folder.
+
+    The extension is checked on the os.scandir entry names, so that a Path object is only
+    created for the morphology files and not for every entry of the folder.
+    """
+    try:
+        entries = os.scandir(folder)
+    except (FileNotFoundError, NotADirectoryError):
+        # Same as Path(folder).glob('*')
+        return
+    with entries:
+        for entry in entries:
+            if os.path.splitext(entry.name)[1][1:].lower() in extensions:
+                yield Path(folder, entry.name)
 
 
 def find_morph(folder: Path, stem: str) -> Optional[Path]:
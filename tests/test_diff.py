@@ -1,3 +1,4 @@
+import os
 from pathlib import Path
 from pkg_resources import get_distribution, parse_version
 
@@ -125,3 +126,26 @@ def test_equality():
     else:
         assert result
     set_ignored_warning([Warning.wrong_duplicate, Warning.only_child], False)
+
+
+def test_diff_file_rewritten(tmpdir):
+    filename = Path(tmpdir, 'morph.asc')
+    neuron = Morphology(DATA / 'simple.asc')
+    neuron.write(filename)
+    assert not diff(filename, DATA / 'simple.asc')
+
+    # Rewrite the file but keep its timestamps, as `cp -p` or `rsync -a` would
+    stat = os.stat(filename)
+    neuron.section(0).points += 1
+    neuron.write(filename)
+    os.utime(filename, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+    assert diff(filename, DATA / 'simple.asc')
+
+    # Same relative path, different working directory
+    other_dir = tmpdir.mkdir('other')
+    Morphology(DATA / 'simple.asc').write(Path(other_dir, 'morph.asc'))
+    os.utime(Path(other_dir, 'morph.asc'), ns=(stat.st_atime_ns, stat.st_mtime_ns))
+    with tmpdir.as_cwd():
+        assert diff('morph.asc', DATA / 'simple.asc')
+    with other_dir.as_cwd():
+        assert not diff('morph.asc', DATA / 'simple.asc')
@@ -1,6 +1,7 @@
 from pathlib import Path
 
 import morph_tool.morphdb as tested
+import numpy as np
 import pandas as pd
 import pytest
 from numpy.testing import assert_array_equal
@@ -70,6 +71,18 @@ def test_read_msubtype():
                                                  columns=columns))
 
 
+def test_read_empty_mtype(tmpdir):
+    path = Path(tmpdir, 'neurondb.xml')
+    path.write_text('<neurondb><listing>'
+                    '<morphology><name>a</name><mtype/><layer>1</layer></morphology>'
+                    '<morphology><name>b</name><mtype/><msubtype>A</msubtype><layer>1</layer>'
+                    '</morphology></listing></neurondb>')
+    df = tested.MorphDB.from_neurondb(path).df
+    assert df.mtype.tolist() == ['', 'A']
+    assert df.mtype_no_subtype.tolist() == ['', 'A']
+    assert df.msubtype.tolist() == ['', '']
+
+
 def test_write_neurondb_dat(tmpdir):
     morphology_folder = DATA_DIR / 'morphdb/from_neurondb/'
     original = tested.MorphDB.from_neurondb(morphology_folder / 'neurondb-msubtype.xml')
@@ -81,6 +94,25 @@ def test_write_neurondb_dat(tmpdir):
     assert_frame_equal(original.df, new.df)
 
 
+def test_read_neurondb_dat_numeric_names(tmpdir):
+    path = Path(tmpdir, 'neurondb.dat')
+    path.write_text('0001 1 L1_DAC\n0002 02 L2_TPC:A\n')
+    Path(tmpdir, '0001.asc').write_text((DATA_DIR / 'simple.asc').read_text())
+    df = tested.MorphDB.from_neurondb(path).df
+    assert df.name.tolist() == ['0001', '0002']
+    assert df.layer.tolist() == ['1', '02']
+    assert df.path[0] == Path(tmpdir, '0001.asc')
+    assert pd.isna(df.path[1])
+
+
+def test_read_neurondb_dat_missing_mtype(tmpdir):
+    path = Path(tmpdir, 'neurondb.dat')
+    path.write_text('a 1\nb 2 L2_TPC:A\n')
+    df = tested.MorphDB.from_neurondb(path).df
+    assert df.mtype_no_subtype.tolist() == ['', 'L2_TPC']
+    assert df.msubtype.tolist() == ['', 'A']
+
+
 def test_add():
     original = tested.MorphDB.from_neurondb(
         DATA_DIR / 'morphdb/from_neurondb/neurondb-msubtype.xml')
@@ -141,6 +173,53 @@ def test_load_raises():
         original.write(Path('neurondb.wrong-format'))
 
 
+def test_load_raises_wrong_xml_structure(tmpdir):
+    path = Path(tmpdir, 'neurondb.xml')
+    path.write_text('<neuronDB><listing><morphology><name>a</name><mtype>L1_DAC</mtype>'
+                    '<layer>1</layer></morphology></listing></neuronDB>')
+    with pytest.raises(ValueError, match='<neurondb><listing>'):
+        tested.MorphDB.from_neurondb(path)
+
+
+def test_load_empty_listing(tmpdir):
+    path = Path(tmpdir, 'neurondb.xml')
+    path.write_text('<neurondb><listing></listing></neurondb>')
+    df = tested.MorphDB.from_neurondb(path).df
+    assert df.empty
+    assert (df[['name', 'mtype', 'msubtype', 'mtype_no_subtype', 'layer', 'label', 'path',
+                'axon_inputs']].dtypes == object).all()
+    assert (df[tested.BOOLEAN_REPAIR_ATTRS].dtypes == bool).all()
+
+
+def test_MorphInfo_raises_non_bool_flag():
+    with pytest.raises(ValueError, match='use_axon must be a boolean'):
+        tested.MorphInfo(name='a', mtype='b', use_axon='false')
+    with pytest.raises(ValueError, match='unravel must be a boolean'):
+        tested.MorphInfo(name='a', mtype='b', unravel=None)
+    db = tested.MorphDB([tested.MorphInfo(name='a', mtype='b', use_axon=0, unravel=np.int64(1))])
+    assert db.df.use_axon.tolist() == [False]
+    assert db.df.unravel.tolist() == [True]
+
+
+def test_add_bool_dtypes():
+    db1 = tested.MorphDB([tested.MorphInfo(name='a', mtype='b', use_axon=False)])
+    db2 = tested.MorphDB([tested.MorphInfo(name='c', mtype='d')])
+    assert (db1.df[tested.BOOLEAN_REPAIR_ATTRS].dtypes == bool).all()
+    assert ((db1 + db2).df[tested.BOOLEAN_REPAIR_ATTRS].dtypes == bool).all()
+    db1 += db2
+    assert (db1.df[tested.BOOLEAN_REPAIR_ATTRS].dtypes == bool).all()
+    assert db1.df.use_axon.tolist() == [False, True]
+
+
+def test_write_empty_neurondb_xml(tmpdir):
+    path = Path(tmpdir, 'neurondb.xml')
+    tested.MorphDB().write(path)
+    assert '<listing></listing>' in path.read_text()
+    df = tested.MorphDB.from_neurondb(path).df
+    assert df.empty
+    assert_array_equal(df.columns, tested.MorphDB().df.columns)
+
+
 def test_features():
     original = tested.MorphDB.from_neurondb(
         DATA_DIR / 'morphdb/from_neurondb/neurondb-only-dat-info.xml')
@@ -169,6 +248,11 @@ def test_check_file_exists():
     with pytest.raises(ValueError):
         original.check_files_exist()
 
+    # Several null paths should raise as well
+    original.df.loc[0, 'path'] = None
+    with pytest.raises(ValueError, match='undefined filepaths'):
+        original.check_files_exist()
+
     # A non existing path should raise
     original = tested.MorphDB.from_neurondb(
         DATA_DIR / 'morphdb/from_neurondb/neurondb-only-dat-info.xml')
@@ -176,6 +260,11 @@ def test_check_file_exists():
     with pytest.raises(ValueError):
         original.check_files_exist()
 
+    # All the non existing paths are reported
+    original.df.loc[0, 'path'] = Path('/other/non/existing/path')
+    with pytest.raises(ValueError, match='/other/non/existing/path.*/non/existing/path'):
+        original.check_files_exist()
+
 
 def test_hashable():
     morphology_folder = DATA_DIR / 'morphdb/from_neurondb/'
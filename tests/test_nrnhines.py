@@ -1,6 +1,7 @@
 from pathlib import Path
 import numpy as np
-from numpy.testing import assert_array_almost_equal
+from neurom import load_morphology
+from numpy.testing import assert_array_almost_equal, assert_array_equal
 
 import morph_tool.nrnhines as tested
 
@@ -31,6 +32,31 @@ def test_interpolate_compartments():
                                [2., 2., 0.]])
 
 
+def test_compartment_paths_dtype():
+    points = np.array([[0, 0, 0],
+                       [1, 0, 0],
+                       [1, 2, 0],
+                       [2, 2, 0]])
+    # NumPy >= 2 always uses the 'weak' (NEP 50) promotion
+    if hasattr(np, '_set_promotion_state'):
+        initial_state = np._get_promotion_state()
+        promotion_states = ['legacy', 'weak']
+    else:
+        promotion_states = [None]
+    for promotion_state in promotion_states:
+        if promotion_state:
+            np._set_promotion_state(promotion_state)
+        try:
+            for dtype, expected in [(np.float32, np.float32),
+                                    (np.float64, np.float64),
+                                    (np.int64, np.float64)]:
+                paths = tested._compartment_paths(points.astype(dtype), 3)
+                assert all(path.dtype == expected for path in paths)
+        finally:
+            if promotion_state:
+                np._set_promotion_state(initial_state)
+
+
 def test_NeuroM_section_to_NRN_compartment_paths():
     mapping = tested.NeuroM_section_to_NRN_compartment_paths(SIMPLE)
 
@@ -41,6 +67,24 @@ def test_NeuroM_section_to_NRN_compartment_paths():
                                             [-6., 5., 0.]]])
 
 
+def test_preloaded_cells():
+    NeuroM_cell = load_morphology(SIMPLE)
+    NRN_cell = tested.get_NRN_cell(SIMPLE)
+
+    assert (tested.NeuroM_section_to_NRN_section(SIMPLE, NeuroM_cell=NeuroM_cell,
+                                                 NRN_cell=NRN_cell) ==
+            tested.NeuroM_section_to_NRN_section(SIMPLE))
+
+    expected = tested.NeuroM_section_to_NRN_compartment_paths(SIMPLE)
+    mapping = tested.NeuroM_section_to_NRN_compartment_paths(SIMPLE, NeuroM_cell=NeuroM_cell,
+                                                             NRN_cell=NRN_cell)
+    assert mapping.keys() == expected.keys()
+    for section_id, paths in expected.items():
+        assert len(mapping[section_id]) == len(paths)
+        for path, expected_path in zip(mapping[section_id], paths):
+            assert_array_equal(path, expected_path)
+
+
 def test_point_to_section_end():
     cell = tested.get_NRN_cell(SIMPLE)
     assert (tested.point_to_section_end(cell.icell.all, [-8, 10, 0]) ==
@@ -54,6 +98,15 @@ def test_point_to_section_end():
                  3)
 
 
+def test_points_to_section_ends():
+    cell = tested.get_NRN_cell(SIMPLE)
+    points = [[-8, 10, 0], [-8, 10, 2], [0, 5, 0]]
+    assert tested.points_to_section_ends(cell.icell.all, points) == [6, None, 3]
+    assert (tested.points_to_section_ends(cell.icell.all, points, atol=8) ==
+            [tested.point_to_section_end(cell.icell.all, point, atol=8) for point in points])
+    assert tested.points_to_section_ends(cell.icell.all, []) == []
+
+
 def _to_be_isolated(morphology_path, point):
     """Convert a point position to NEURON section index and return cell name and id.
 